@@ -18,13 +18,25 @@ Usage:
 
 import argparse
 import asyncio
+import gc
+import multiprocessing
 import os
 import sqlite3
+import struct
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
-from decimal import Decimal
+from functools import lru_cache
+from itertools import chain, dropwhile, islice
 from pathlib import Path
 
 import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+try:
+    import uvloop
+except ImportError:  # optional: pip install -e ".[migrate]"
+    uvloop = None
 
 # Default paths
 SCRIPT_DIR = Path(__file__).parent
@@ -35,6 +47,92 @@ DEFAULT_POSTGRES_URL = os.environ.get(
 ).replace("+asyncpg", "").replace("postgresql+asyncpg", "postgresql")
 
 BATCH_SIZE = 10000
+POOL_SIZE = 8  # PostgreSQL connections shared by the concurrent table loaders
+
+# PostgreSQL binary COPY framing
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)  # Signature, flags, extension
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+COPY_BINARY_NULL = struct.pack(">i", -1)
+_PACK_FIELD_COUNT = struct.Struct(">h").pack
+_PACK_LENGTH = struct.Struct(">i").pack
+_PACK_INT4 = struct.Struct(">ii").pack  # Length prefix + value
+_PACK_INT8 = struct.Struct(">iq").pack
+_PACK_FLOAT8 = struct.Struct(">id").pack
+_PG_EPOCH_ORDINAL = date(2000, 1, 1).toordinal()  # Binary dates count days from here
+
+# A 512 MiB page cache plus mmap make the large scans mostly memcpy.
+# Journal and sync pragmas are left alone: a read-only connection never
+# writes, and journal_mode=OFF fails on sources in WAL mode.
+SQLITE_READ_PRAGMAS = """
+    PRAGMA cache_size = -524288;
+    PRAGMA mmap_size = 30000000000;
+    PRAGMA temp_store = MEMORY;
+"""
+
+# Session settings for the migration connections. The load is idempotent and
+# re-runnable, so commits need not wait for the WAL flush.
+PG_SERVER_SETTINGS = {
+    "synchronous_commit": "off",
+    "work_mem": "256MB",
+}
+MAX_QUERY_PARAMS = 32767  # Bind arguments asyncpg accepts per statement
+QUEUE_SIZE = 4  # Batches buffered between the SQLite reader and PostgreSQL writer
+COMMIT_EVERY_BATCHES = 50  # daily_k_data batches per transaction
+
+# Target columns loaded through COPY (id and created_at use server defaults)
+DAILY_K_COLUMNS = (
+    "date", "code", "open", "high", "low", "close", "preclose", "volume", "amount",
+    "turn", "trade_status", "pct_chg", "pe_ttm", "pb_mrq", "ps_ttm", "pcf_ncf_ttm", "is_st",
+)
+ADJUST_FACTOR_COLUMNS = (
+    "code", "divid_operate_date", "fore_adjust_factor", "back_adjust_factor", "adjust_factor",
+)
+
+# NUMERIC target columns, staged as DOUBLE PRECISION
+DAILY_K_NUMERIC_COLUMNS = frozenset({
+    "open", "high", "low", "close", "preclose", "amount",
+    "turn", "pct_chg", "pe_ttm", "pb_mrq", "ps_ttm", "pcf_ncf_ttm",
+})
+ADJUST_FACTOR_NUMERIC_COLUMNS = frozenset({
+    "fore_adjust_factor", "back_adjust_factor", "adjust_factor",
+})
+
+# (name, table, columns, unique); skipped when an equivalent index already
+# exists, e.g. the ones alembic creates under its own names
+INDEXES = (
+    ("idx_daily_k_code_date", "daily_k_data", ("code", "date"), True),
+    ("idx_daily_k_date", "daily_k_data", ("date",), False),
+    ("idx_daily_k_code", "daily_k_data", ("code",), False),
+    ("idx_adjust_factor_code", "adjust_factor", ("code",), False),
+    ("idx_stock_basic_exchange", "stock_basic", ("exchange",), False),
+)
+
+
+def connect_sqlite(source_path: Path) -> sqlite3.Connection:
+    """Open the SQLite source read-only, tuned for large sequential scans.
+
+    Readers fetch from it in worker threads. Rows stay plain tuples: columns
+    are resolved once and indexed positionally.
+    """
+    conn = sqlite3.connect(
+        f"{source_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+    )
+    conn.executescript(SQLITE_READ_PRAGMAS)
+    return conn
+
+
+@lru_cache(maxsize=8192)
+def _parse_date_text(text: str) -> date | None:
+    """Parse a YYYY-MM-DD string (cached: the same trading days repeat across all rows)."""
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    # strptime also accepts non-zero-padded months and days
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        return None
 
 
 def parse_date(val):
@@ -43,14 +141,48 @@ def parse_date(val):
         return None
     if isinstance(val, date):
         return val
+    return _parse_date_text(str(val))
+
+
+def safe_numeric(val):
+    """Convert a SQLite numeric value to float for the float8 staging columns."""
+    # REAL columns almost always hold floats already
+    if isinstance(val, (int, float)):
+        return val
+    if val is None:
+        return None
     try:
-        return datetime.strptime(str(val), "%Y-%m-%d").date()
-    except:
+        return float(val)
+    except (ValueError, TypeError):
         return None
 
 
-async def create_tables(conn: asyncpg.Connection) -> None:
-    """Create tables if they don't exist."""
+def safe_int(val):
+    """Convert a SQLite numeric value to int."""
+    if isinstance(val, int):
+        return val
+    if val is None or val == "":
+        return None
+    try:
+        return int(float(val))
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def values_placeholders(num_rows: int, num_columns: int) -> str:
+    """Build "($1, $2), ($3, $4), ..." for a multi-row VALUES clause."""
+    return ", ".join(
+        "(" + ", ".join(f"${row * num_columns + col}" for col in range(1, num_columns + 1)) + ")"
+        for row in range(num_rows)
+    )
+
+
+async def create_tables_no_indexes(conn: asyncpg.Connection) -> None:
+    """Create tables if they don't exist, leaving daily_k_data unindexed.
+
+    Building the daily_k_data indexes once after the load is much cheaper than
+    maintaining them row by row; see create_indexes_and_constraints().
+    """
     await conn.execute("""
         CREATE TABLE IF NOT EXISTS stock_basic (
             code VARCHAR(20) PRIMARY KEY,
@@ -87,8 +219,7 @@ async def create_tables(conn: asyncpg.Connection) -> None:
             ps_ttm NUMERIC(12, 4),
             pcf_ncf_ttm NUMERIC(12, 4),
             is_st INTEGER,
-            created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(code, date)
+            created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
@@ -105,16 +236,191 @@ async def create_tables(conn: asyncpg.Connection) -> None:
         )
     """)
 
-    # Create indexes
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_k_date ON daily_k_data(date)")
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_k_code ON daily_k_data(code)")
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_adjust_factor_code ON adjust_factor(code)")
-    await conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_basic_exchange ON stock_basic(exchange)")
+    # Bookkeeping for resumed runs; see migrate_daily_k_data()
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS sqlite_migration_state (
+            table_name VARCHAR(63) PRIMARY KEY,
+            source TEXT,
+            dropped_indexes TEXT[] NOT NULL DEFAULT '{}',
+            updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS sqlite_migration_watermarks (
+            partition VARCHAR(20) PRIMARY KEY,
+            code TEXT NOT NULL,
+            date TEXT NOT NULL
+        )
+    """)
+
+    print("Tables created successfully")
+
+
+async def has_index(
+    conn: asyncpg.Connection, table: str, columns: tuple[str, ...], unique: bool
+) -> bool:
+    """Check for a valid plain index on exactly these columns, whatever its name."""
+    return await conn.fetchval(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_index x
+            WHERE x.indrelid = $1::regclass
+              AND x.indisvalid AND (x.indisunique OR NOT $3)
+              AND x.indpred IS NULL AND x.indexprs IS NULL
+              AND ARRAY(
+                  SELECT a.attname::text
+                  FROM unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, n)
+                  JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+                  ORDER BY k.n
+              ) = $2::text[]
+        )
+        """,
+        table, list(columns), unique,
+    )
+
+
+async def create_indexes_and_constraints(
+    conn: asyncpg.Connection, unique_only: bool = False
+) -> None:
+    """Create the indexes and the daily_k_data unique key that don't exist yet.
+
+    Tables created by alembic or by earlier versions of this script already
+    carry some of them under other names (idx_daily_k_code_date, the
+    daily_k_data_code_date_key constraint); those are not duplicated.
+    """
+    for name, table, columns, unique in INDEXES:
+        if unique_only and not unique:
+            continue
+        if await has_index(conn, table, columns, unique):
+            continue
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        await conn.execute(
+            f"CREATE {kind} IF NOT EXISTS {name} ON {table}({', '.join(columns)})"
+        )
+
+    print("Indexes created successfully")
+
+
+async def drop_secondary_indexes(conn: asyncpg.Connection, keep_unique: bool) -> list[str]:
+    """Drop daily_k_data's indexes except those backing constraints.
+
+    With keep_unique, unique indexes stay too: they are the ON CONFLICT
+    arbiters of the merge. Returns the definitions so finish_bulk_load() can
+    rebuild them as they were, e.g. the indexes alembic created.
+    """
+    rows = await conn.fetch("""
+        SELECT x.indexrelid::regclass::text AS name, pg_get_indexdef(x.indexrelid) AS definition
+        FROM pg_index x
+        WHERE x.indrelid = 'daily_k_data'::regclass
+          AND NOT (x.indisunique AND $1)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    """, keep_unique)
+    for row in rows:
+        await conn.execute(f"DROP INDEX {row['name']}")
+    return [row["definition"] for row in rows]
+
+
+async def prepare_bulk_load(conn: asyncpg.Connection, bulk: bool, on_conflict: bool) -> None:
+    """Set daily_k_data up for the load; undone by finish_bulk_load().
+
+    Autovacuum is paused meanwhile. For a bulk load, i.e. one adding at least
+    as many rows as the table holds, the secondary indexes are also dropped and
+    the table is switched to UNLOGGED so the load itself skips WAL; both
+    rewrites cost less than the rows being added.
+
+    The dropped index definitions are saved in sqlite_migration_state, so a
+    run killed before finish_bulk_load() leaves them for the next run to
+    rebuild. All of it is one transaction, so a failure part-way leaves the
+    table as it was.
+    """
+    async with conn.transaction():
+        if bulk:
+            dropped_indexes = await drop_secondary_indexes(conn, keep_unique=on_conflict)
+            await conn.execute(
+                """
+                INSERT INTO sqlite_migration_state (table_name, dropped_indexes)
+                VALUES ('daily_k_data', $1)
+                ON CONFLICT (table_name) DO UPDATE SET
+                    dropped_indexes = sqlite_migration_state.dropped_indexes
+                        || EXCLUDED.dropped_indexes,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                dropped_indexes,
+            )
+            await conn.execute("ALTER TABLE daily_k_data SET UNLOGGED")
+        await conn.execute("ALTER TABLE daily_k_data SET (autovacuum_enabled = false)")
+
+
+async def finish_bulk_load(conn: asyncpg.Connection) -> None:
+    """Make daily_k_data durable again, rebuild its indexes and refresh its statistics.
+
+    Runs even when the load fails: PostgreSQL truncates UNLOGGED tables
+    during crash recovery, so the table must not be left in that state.
+    Also rebuilds indexes left dropped by an earlier, killed run.
+    """
+    print("\nFinalizing daily_k_data...")
+    # No-op when the table is already logged. SET LOGGED rewrites the table
+    # and its indexes, so indexes are rebuilt afterwards.
+    await conn.execute("ALTER TABLE daily_k_data SET LOGGED")
+    await conn.execute("ALTER TABLE daily_k_data RESET (autovacuum_enabled)")
+
+    dropped_indexes = await conn.fetchval(
+        "SELECT dropped_indexes FROM sqlite_migration_state WHERE table_name = 'daily_k_data'"
+    )
+    for definition in dropped_indexes or ():
+        # pg_get_indexdef() output starts with CREATE [UNIQUE] INDEX <name>; an
+        # interrupted rebuild may already have recreated some of them
+        await conn.execute(definition.replace(" INDEX ", " INDEX IF NOT EXISTS ", 1))
+    await conn.execute(
+        "UPDATE sqlite_migration_state SET dropped_indexes = '{}' WHERE table_name = 'daily_k_data'"
+    )
+    await conn.execute("ANALYZE daily_k_data")
+
+
+async def create_staging_tables(conn: asyncpg.Connection) -> None:
+    """Create session-local staging tables used as COPY targets.
+
+    COPY has no ON CONFLICT clause, so rows are copied here first and merged
+    into the real tables with INSERT ... SELECT. Temporary tables skip WAL
+    like UNLOGGED ones and are private to the connection.
+
+    Numeric columns are DOUBLE PRECISION so the SQLite REAL values are sent
+    as native float8 and converted to NUMERIC by the server during the merge.
+    """
+    await conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS daily_k_data_staging (
+            date DATE NOT NULL,
+            code VARCHAR(20) NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            preclose DOUBLE PRECISION,
+            volume BIGINT,
+            amount DOUBLE PRECISION,
+            turn DOUBLE PRECISION,
+            trade_status INTEGER,
+            pct_chg DOUBLE PRECISION,
+            pe_ttm DOUBLE PRECISION,
+            pb_mrq DOUBLE PRECISION,
+            ps_ttm DOUBLE PRECISION,
+            pcf_ncf_ttm DOUBLE PRECISION,
+            is_st INTEGER
+        )
+    """)
 
-    print("Tables and indexes created successfully")
+    await conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS adjust_factor_staging (
+            code VARCHAR(20) NOT NULL,
+            divid_operate_date DATE,
+            fore_adjust_factor DOUBLE PRECISION,
+            back_adjust_factor DOUBLE PRECISION,
+            adjust_factor DOUBLE PRECISION
+        )
+    """)
 
 
-async def migrate_stock_basic(sqlite_conn: sqlite3.Connection, pg_conn: asyncpg.Connection) -> int:
+async def migrate_stock_basic(sqlite_conn: sqlite3.Connection, pool: asyncpg.Pool) -> int:
     """Migrate stock_basic table."""
     print("\nMigrating stock_basic...")
 
@@ -148,105 +454,422 @@ async def migrate_stock_basic(sqlite_conn: sqlite3.Connection, pg_conn: asyncpg.
             None,  # industry
         ))
 
-    # Batch insert
-    await pg_conn.executemany(
-        """
-        INSERT INTO stock_basic (code, code_name, ipo_date, out_date, stock_type, status, exchange, sector, industry)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-        ON CONFLICT (code) DO UPDATE SET
-            code_name = EXCLUDED.code_name,
-            updated_at = CURRENT_TIMESTAMP
-        """,
-        records,
-    )
+    # Batch insert, one multi-row VALUES statement per chunk
+    num_columns = len(records[0])
+    rows_per_statement = MAX_QUERY_PARAMS // num_columns
+
+    async with pool.acquire() as pg_conn, pg_conn.transaction():
+        for start in range(0, len(records), rows_per_statement):
+            chunk = records[start:start + rows_per_statement]
+            await pg_conn.execute(
+                f"""
+                INSERT INTO stock_basic (code, code_name, ipo_date, out_date, stock_type, status, exchange, sector, industry)
+                VALUES {values_placeholders(len(chunk), num_columns)}
+                ON CONFLICT (code) DO UPDATE SET
+                    code_name = EXCLUDED.code_name,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                *chain.from_iterable(chunk),
+            )
 
     print(f"  Migrated {len(records)} stock_basic records")
     return len(records)
 
 
-async def migrate_daily_k_data(sqlite_conn: sqlite3.Connection, pg_conn: asyncpg.Connection) -> int:
-    """Migrate daily_k_data table in batches."""
-    print("\nMigrating daily_k_data...")
+def _encode_date(val: date) -> bytes:
+    return _PACK_INT4(4, val.toordinal() - _PG_EPOCH_ORDINAL)
 
-    # Get total count
-    cursor = sqlite_conn.execute("SELECT COUNT(*) FROM daily_k_data")
-    total = cursor.fetchone()[0]
-    print(f"  Total records: {total:,}")
 
-    cursor = sqlite_conn.execute("SELECT * FROM daily_k_data")
-    columns = [desc[0] for desc in cursor.description]
+def _encode_text(val: str) -> bytes:
+    data = val.encode()
+    return _PACK_LENGTH(len(data)) + data
 
-    migrated = 0
-    batch = []
-
-    while True:
-        rows = cursor.fetchmany(BATCH_SIZE)
-        if not rows:
-            break
-
-        for row in rows:
-            record = dict(zip(columns, row))
-
-            # Convert values
-            def safe_decimal(val):
-                if val is None or val == "":
-                    return None
-                try:
-                    return Decimal(str(val))
-                except:
-                    return None
-
-            def safe_int(val):
-                if val is None or val == "":
-                    return None
-                try:
-                    return int(float(val))
-                except:
-                    return None
-
-            batch.append((
-                parse_date(record.get("date")),
-                record.get("code"),
-                safe_decimal(record.get("open")),
-                safe_decimal(record.get("high")),
-                safe_decimal(record.get("low")),
-                safe_decimal(record.get("close")),
-                safe_decimal(record.get("preclose")),
-                safe_int(record.get("volume")),
-                safe_decimal(record.get("amount")),
-                safe_decimal(record.get("turn")),
-                safe_int(record.get("tradestatus")),
-                safe_decimal(record.get("pctChg")),
-                safe_decimal(record.get("peTTM")),
-                safe_decimal(record.get("pbMRQ")),
-                safe_decimal(record.get("psTTM")),
-                safe_decimal(record.get("pcfNcfTTM")),
-                safe_int(record.get("isST")),
-            ))
-
-        # Insert batch
-        await pg_conn.executemany(
-            """
-            INSERT INTO daily_k_data (
-                date, code, open, high, low, close, preclose, volume, amount,
-                turn, trade_status, pct_chg, pe_ttm, pb_mrq, ps_ttm, pcf_ncf_ttm, is_st
-            )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
-            ON CONFLICT (code, date) DO NOTHING
-            """,
-            batch,
+
+def _encode_int4(val: int) -> bytes:
+    return _PACK_INT4(4, val)
+
+
+def _encode_int8(val: int) -> bytes:
+    return _PACK_INT8(8, val)
+
+
+def _encode_float8(val: float) -> bytes:
+    return _PACK_FLOAT8(8, val)
+
+
+# Binary field encoders matching daily_k_data_staging's column types, in DAILY_K_COLUMNS order
+DAILY_K_STAGING_ENCODERS = (
+    _encode_date, _encode_text,
+    _encode_float8, _encode_float8, _encode_float8, _encode_float8, _encode_float8,
+    _encode_int8, _encode_float8, _encode_float8, _encode_int4, _encode_float8,
+    _encode_float8, _encode_float8, _encode_float8, _encode_float8, _encode_int4,
+)
+
+
+def encode_copy_binary(records: Iterable[tuple], encoders: tuple) -> bytes:
+    """Encode records as a complete PostgreSQL binary COPY stream.
+
+    Each field is a big-endian int32 length (-1 for NULL) followed by the
+    value in the type's binary send format, so the server does no parsing.
+    """
+    field_count = _PACK_FIELD_COUNT(len(encoders))
+    parts = [COPY_BINARY_HEADER]
+    append = parts.append
+
+    for record in records:
+        append(field_count)
+        # strict: a short record would otherwise corrupt the stream after the field count
+        for encode, val in zip(encoders, record, strict=True):
+            append(COPY_BINARY_NULL if val is None else encode(val))
+
+    append(COPY_BINARY_TRAILER)
+    return b"".join(parts)
+
+
+def transform_kdata_batch(rows: list[tuple], columns: list[str]) -> list[tuple]:
+    """Convert raw SQLite daily_k_data rows into target tuples."""
+    # Resolve column positions once; rows are indexed positionally below
+    idx = {name: i for i, name in enumerate(columns)}
+    i_date, i_code = idx["date"], idx["code"]
+    i_open, i_high, i_low, i_close = idx["open"], idx["high"], idx["low"], idx["close"]
+    i_preclose, i_volume, i_amount = idx["preclose"], idx["volume"], idx["amount"]
+    i_turn, i_tradestatus, i_pct_chg = idx["turn"], idx["tradestatus"], idx["pctChg"]
+    i_pe_ttm, i_pb_mrq, i_ps_ttm = idx["peTTM"], idx["pbMRQ"], idx["psTTM"]
+    i_pcf_ncf_ttm, i_is_st = idx["pcfNcfTTM"], idx["isST"]
+
+    return [
+        (
+            parse_date(row[i_date]),
+            row[i_code],
+            safe_numeric(row[i_open]),
+            safe_numeric(row[i_high]),
+            safe_numeric(row[i_low]),
+            safe_numeric(row[i_close]),
+            safe_numeric(row[i_preclose]),
+            safe_int(row[i_volume]),
+            safe_numeric(row[i_amount]),
+            safe_numeric(row[i_turn]),
+            safe_int(row[i_tradestatus]),
+            safe_numeric(row[i_pct_chg]),
+            safe_numeric(row[i_pe_ttm]),
+            safe_numeric(row[i_pb_mrq]),
+            safe_numeric(row[i_ps_ttm]),
+            safe_numeric(row[i_pcf_ncf_ttm]),
+            safe_int(row[i_is_st]),
         )
+        for row in rows
+    ]
+
+
+def encode_kdata_batch(rows: list[tuple], columns: list[str]) -> bytes:
+    """Convert raw daily_k_data rows straight into a binary COPY payload (worker process)."""
+    return encode_copy_binary(transform_kdata_batch(rows, columns), DAILY_K_STAGING_ENCODERS)
+
+
+async def prepare_staging_merge(
+    pg_conn: asyncpg.Connection,
+    table: str,
+    columns: tuple[str, ...],
+    numeric_columns: frozenset[str],
+    conflict_columns: str | None,
+) -> PreparedStatement:
+    """Prepare the INSERT ... SELECT that moves staged rows into the table.
+
+    Prepared once per connection and reused for every batch. With
+    conflict_columns, rows already present are skipped via ON CONFLICT DO NOTHING.
+    """
+    column_list = ", ".join(columns)
+    # float8 -> text yields the shortest round-trip digits (as Python's str() does),
+    # so NUMERIC rounding matches the float's decimal form rather than its binary value
+    select_list = ", ".join(
+        f"{col}::text::numeric" if col in numeric_columns else col for col in columns
+    )
+    on_conflict = f"ON CONFLICT ({conflict_columns}) DO NOTHING" if conflict_columns else ""
 
-        migrated += len(batch)
-        progress = (migrated / total) * 100
-        print(f"  Progress: {migrated:,}/{total:,} ({progress:.1f}%)")
-        batch = []
+    return await pg_conn.prepare(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {select_list} FROM {table}_staging
+        {on_conflict}
+    """)
 
-    print(f"  Migrated {migrated:,} daily_k_data records")
-    return migrated
 
+async def copy_via_staging(
+    pg_conn: asyncpg.Connection,
+    table: str,
+    columns: tuple[str, ...],
+    merge: PreparedStatement,
+    records: Iterable[tuple] | bytes,
+) -> None:
+    """COPY records into the table's staging copy, then merge them into the table.
+
+    records are either converted tuples or a ready-made binary COPY payload
+    (see encode_copy_binary); merge comes from prepare_staging_merge().
+    """
+    staging = f"{table}_staging"
+
+    if isinstance(records, bytes):
+        # memoryview: asyncpg would take raw bytes for a file path
+        await pg_conn.copy_to_table(
+            staging, source=memoryview(records), columns=columns, format="binary"
+        )
+    else:
+        await pg_conn.copy_records_to_table(staging, records=records, columns=columns)
+    await merge.fetch()
+    await pg_conn.execute(f"TRUNCATE {staging}")
+
+
+class Progress:
+    """Row counter shared by concurrent loaders of one table.
+
+    Every update happens on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, total: int, skipped: int = 0) -> None:
+        self.total = total
+        self.skipped = skipped  # Rows already present from an earlier run
+        self.migrated = 0
+
+    def advance(self, count: int) -> None:
+        self.migrated += count
+        done = self.skipped + self.migrated
+        progress = (done / self.total) * 100
+        print(f"  Progress: {done:,}/{self.total:,} ({progress:.1f}%)")
+
+
+def source_fingerprint(source_path: Path) -> str:
+    """Identify the source file's current contents by path, size and mtime.
+
+    Includes the -wal file when present: commits in WAL mode land there first.
+    """
+    path = source_path.resolve()
+    parts = [str(path)]
+    for file in (path, path.with_name(f"{path.name}-wal")):
+        if file.exists():
+            stat = file.stat()
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def skip_migrated(
+    rows: Iterable[tuple], columns: list[str], watermark: tuple[str, str]
+) -> Iterator[tuple]:
+    """Drop rows up to and including the watermark, the last committed (code, date).
+
+    rows come in the source's ORDER BY code, date, so the raw text values are
+    compared rather than parsed dates: "2024-1-10" sorts before "2024-1-2".
+    """
+    i_code, i_date = columns.index("code"), columns.index("date")
+    return dropwhile(lambda row: (row[i_code], row[i_date]) <= watermark, rows)
+
+
+async def migrate_daily_k_partition(
+    source_path: Path,
+    pool: asyncpg.Pool,
+    process_pool: ProcessPoolExecutor,
+    prefix: str,
+    on_conflict: bool,
+    watermark: tuple[str, str] | None,
+    progress: Progress,
+) -> None:
+    """Migrate the daily_k_data rows whose code starts with prefix.
+
+    Rows are read in (code, date) order, so whatever an earlier run committed
+    is exactly the rows up to the last committed (code, date), which each
+    transaction records in sqlite_migration_watermarks; rows up to watermark
+    are skipped. With on_conflict, rows that are already present are skipped
+    by ON CONFLICT as well.
+    """
+    loop = asyncio.get_running_loop()
+    sqlite_conn = connect_sqlite(source_path)
 
-async def migrate_adjust_factor(sqlite_conn: sqlite3.Connection, pg_conn: asyncpg.Connection) -> int:
+    try:
+        # GLOB on a literal prefix is served by the UNIQUE(code, date) index,
+        # which also yields the rows already sorted by (code, date)
+        cursor = sqlite_conn.execute(
+            "SELECT * FROM daily_k_data WHERE code GLOB ? ORDER BY code, date", (f"{prefix}*",)
+        )
+        columns = [desc[0] for desc in cursor.description]
+        i_code, i_date = columns.index("code"), columns.index("date")
+        source = skip_migrated(cursor, columns, watermark) if watermark else cursor
+
+        # Overlap SQLite reads, row conversion and PostgreSQL writes; the queue
+        # holds (row count, last (code, date), pending payload) and its bound
+        # caps the batches in flight
+        queue: asyncio.Queue[
+            tuple[int, tuple[str, str], asyncio.Future[bytes]] | None
+        ] = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+        async def produce() -> None:
+            while True:
+                # Iterating the cursor steps sqlite3 one row at a time
+                rows = await asyncio.to_thread(lambda: list(islice(source, BATCH_SIZE)))
+                if not rows:
+                    break
+                await queue.put((
+                    len(rows),
+                    (rows[-1][i_code], rows[-1][i_date]),
+                    loop.run_in_executor(process_pool, encode_kdata_batch, rows, columns),
+                ))
+            await queue.put(None)
+
+        async def consume() -> None:
+            async with pool.acquire() as pg_conn:
+                await create_staging_tables(pg_conn)
+                merge = await prepare_staging_merge(
+                    pg_conn, "daily_k_data", DAILY_K_COLUMNS, DAILY_K_NUMERIC_COLUMNS,
+                    "code, date" if on_conflict else None,
+                )
+
+                done = False
+                while not done:
+                    # Amortize commits over several batches while bounding the rollback
+                    async with pg_conn.transaction():
+                        last_key = None
+                        for _ in range(COMMIT_EVERY_BATCHES):
+                            item = await queue.get()
+                            if item is None:
+                                done = True
+                                break
+                            count, last_key, pending = item
+                            payload = await pending
+
+                            # Insert batch
+                            await copy_via_staging(
+                                pg_conn, "daily_k_data", DAILY_K_COLUMNS, merge, payload
+                            )
+                            progress.advance(count)
+                            # The future and queue item hold the payload too; drop all of
+                            # them so it is freed now rather than after the next queue.get()
+                            item = pending = payload = None
+
+                        # Committed together with the rows it covers
+                        if last_key is not None:
+                            await pg_conn.execute(
+                                """
+                                INSERT INTO sqlite_migration_watermarks (partition, code, date)
+                                VALUES ($1, $2, $3)
+                                ON CONFLICT (partition) DO UPDATE SET
+                                    code = EXCLUDED.code, date = EXCLUDED.date
+                                """,
+                                prefix, *last_key,
+                            )
+
+                    # Collect explicitly after each commit so heap growth stays bounded
+                    gc.collect()
+
+        # A failure on either side cancels the other, releasing its pool connection
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            tg.create_task(consume())
+
+    finally:
+        sqlite_conn.close()
+
+
+def has_unique_code_date(sqlite_conn: sqlite3.Connection) -> bool:
+    """Check whether the source's daily_k_data has a unique index on (code, date)."""
+    for _, name, unique, _, partial in sqlite_conn.execute("PRAGMA index_list(daily_k_data)"):
+        if not unique or partial:
+            continue
+        quoted = name.replace('"', '""')
+        columns = {row[2] for row in sqlite_conn.execute(f'PRAGMA index_info("{quoted}")')}
+        if columns == {"code", "date"}:
+            return True
+    return False
+
+
+def read_kdata_layout(source_path: Path) -> tuple[int, list[str], bool]:
+    """Count daily_k_data rows per code prefix in a single scan (worker thread).
+
+    Also reports whether the source guarantees unique (code, date) rows.
+    """
+    sqlite_conn = connect_sqlite(source_path)
+    try:
+        # Partition by exchange + board prefix (sh.60, sh.68, sz.00, sz.30, ...)
+        rows = sqlite_conn.execute(
+            "SELECT substr(code, 1, 5), COUNT(*) FROM daily_k_data GROUP BY 1"
+        ).fetchall()
+        unique = has_unique_code_date(sqlite_conn)
+    finally:
+        sqlite_conn.close()
+
+    return sum(count for _, count in rows), [prefix for prefix, _ in rows], unique
+
+
+async def migrate_daily_k_data(
+    source_path: Path,
+    pool: asyncpg.Pool,
+    total: int,
+    prefixes: list[str],
+    existing: int,
+    on_conflict: bool,
+) -> int:
+    """Migrate daily_k_data table, one concurrent task per code prefix.
+
+    A fresh load from a source with unique (code, date) rows needs no
+    ON CONFLICT. Otherwise (on_conflict) rows already present, e.g. from an
+    earlier run, and source duplicates are skipped by ON CONFLICT DO NOTHING.
+
+    Source rows an earlier run of this script already committed are skipped
+    before being sent, using the per-partition watermarks, but only if
+    sqlite_migration_state shows they were recorded for this very source file
+    (see source_fingerprint()). Otherwise all rows are re-sent, e.g. after a
+    run of an older version or with a different or modified source.
+    """
+    print("\nMigrating daily_k_data...")
+    print(f"  Total records: {total:,}")
+    print(f"  Partitions: {', '.join(prefixes)}")
+
+    # Per-partition watermark of what an earlier run already committed
+    watermarks: dict[str, tuple[str, str]] = {}
+    skipped = 0
+    fingerprint = await asyncio.to_thread(source_fingerprint, source_path)
+    async with pool.acquire() as pg_conn, pg_conn.transaction():
+        recorded = await pg_conn.fetchval(
+            "SELECT source FROM sqlite_migration_state WHERE table_name = 'daily_k_data'"
+        )
+        if existing and recorded == fingerprint:
+            rows = await pg_conn.fetch(
+                "SELECT partition, code, date FROM sqlite_migration_watermarks"
+            )
+            watermarks = {row["partition"]: (row["code"], row["date"]) for row in rows}
+            # The table may also hold rows of other sources
+            skipped = min(existing, total)
+            print(f"  Already migrated: {skipped:,} (resuming after the last committed rows)")
+        else:
+            # Watermarks of another source, or of rows no longer there, are meaningless
+            await pg_conn.execute("DELETE FROM sqlite_migration_watermarks")
+            await pg_conn.execute(
+                """
+                INSERT INTO sqlite_migration_state (table_name, source) VALUES ('daily_k_data', $1)
+                ON CONFLICT (table_name) DO UPDATE SET
+                    source = EXCLUDED.source,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                fingerprint,
+            )
+            if existing:
+                print("  Table already has rows; re-sending all, existing ones are skipped")
+
+    progress = Progress(total, skipped)
+
+    # Row conversion is CPU-bound, so it runs in worker processes. They are
+    # spawned rather than forked because reader threads are already running.
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    ) as process_pool:
+        async with asyncio.TaskGroup() as tg:
+            for prefix in prefixes:
+                tg.create_task(migrate_daily_k_partition(
+                    source_path, pool, process_pool, prefix, on_conflict,
+                    watermarks.get(prefix), progress,
+                ))
+
+    print(f"  Migrated {progress.migrated:,} daily_k_data records")
+    return progress.migrated
+
+
+async def migrate_adjust_factor(sqlite_conn: sqlite3.Connection, pool: asyncpg.Pool) -> int:
     """Migrate adjust_factor table."""
     print("\nMigrating adjust_factor...")
 
@@ -264,30 +887,22 @@ async def migrate_adjust_factor(sqlite_conn: sqlite3.Connection, pg_conn: asyncp
     for row in rows:
         record = dict(zip(columns, row))
 
-        def safe_decimal(val):
-            if val is None or val == "":
-                return None
-            try:
-                return Decimal(str(val))
-            except:
-                return None
-
         records.append((
             record.get("code"),
             parse_date(record.get("dividOperateDate")),
-            safe_decimal(record.get("foreAdjustFactor")),
-            safe_decimal(record.get("backAdjustFactor")),
-            safe_decimal(record.get("adjustFactor")),
+            safe_numeric(record.get("foreAdjustFactor")),
+            safe_numeric(record.get("backAdjustFactor")),
+            safe_numeric(record.get("adjustFactor")),
         ))
 
-    await pg_conn.executemany(
-        """
-        INSERT INTO adjust_factor (code, divid_operate_date, fore_adjust_factor, back_adjust_factor, adjust_factor)
-        VALUES ($1, $2, $3, $4, $5)
-        ON CONFLICT (code, divid_operate_date) DO NOTHING
-        """,
-        records,
-    )
+    async with pool.acquire() as pg_conn:
+        await create_staging_tables(pg_conn)
+        merge = await prepare_staging_merge(
+            pg_conn, "adjust_factor", ADJUST_FACTOR_COLUMNS, ADJUST_FACTOR_NUMERIC_COLUMNS,
+            "code, divid_operate_date",
+        )
+        async with pg_conn.transaction():
+            await copy_via_staging(pg_conn, "adjust_factor", ADJUST_FACTOR_COLUMNS, merge, records)
 
     print(f"  Migrated {len(records)} adjust_factor records")
     return len(records)
@@ -305,7 +920,7 @@ async def main(source_path: Path, postgres_url: str):
         from urllib.parse import urlparse
         parsed = urlparse(postgres_url)
         display_url = f"{parsed.hostname}:{parsed.port or 5432}/{parsed.path.lstrip('/')}"
-    except:
+    except ValueError:
         display_url = postgres_url.split('@')[-1] if '@' in postgres_url else postgres_url
     print(f"Target: {display_url}")
 
@@ -316,13 +931,18 @@ async def main(source_path: Path, postgres_url: str):
 
     # Connect to SQLite
     print("\nConnecting to SQLite...")
-    sqlite_conn = sqlite3.connect(str(source_path))
-    sqlite_conn.row_factory = sqlite3.Row
+    sqlite_conn = connect_sqlite(source_path)
 
     # Connect to PostgreSQL
     print("Connecting to PostgreSQL...")
     try:
-        pg_conn = await asyncpg.connect(postgres_url)
+        # Passed as startup parameters so they survive the pool's RESET ALL on release
+        pool = await asyncpg.create_pool(
+            postgres_url,
+            min_size=POOL_SIZE,
+            max_size=POOL_SIZE,
+            server_settings=PG_SERVER_SETTINGS,
+        )
     except Exception as e:
         print(f"\nError connecting to PostgreSQL: {e}")
         print("\nMake sure PostgreSQL is running and the database exists.")
@@ -332,14 +952,45 @@ async def main(source_path: Path, postgres_url: str):
 
     try:
         # Create tables
-        await create_tables(pg_conn)
-
-        # Migrate tables
+        async with pool.acquire() as pg_conn:
+            await create_tables_no_indexes(pg_conn)
+            existing = await pg_conn.fetchval("SELECT count(*) FROM daily_k_data")
+            resume = existing > 0
+            # In a worker thread: a single scan, plus the source's index list
+            total, prefixes, source_unique = await asyncio.to_thread(
+                read_kdata_layout, source_path
+            )
+            # Merge with ON CONFLICT when resuming, or when the source does not
+            # guarantee unique (code, date) rows; the unique index must then
+            # exist up front as the arbiter. All other indexes are built afterwards.
+            on_conflict = resume or not source_unique
+            if on_conflict:
+                await create_indexes_and_constraints(pg_conn, unique_only=True)
+            # E.g. the full dataset loaded on top of the sample data
+            bulk = existing <= total - existing
+            await prepare_bulk_load(pg_conn, bulk, on_conflict)
+
+        # Migrate tables (independent, so they run concurrently). The task group
+        # cancels the remaining loaders if one fails, so their connections are
+        # released and the pool can close.
         start_time = datetime.now()
 
-        stock_count = await migrate_stock_basic(sqlite_conn, pg_conn)
-        kdata_count = await migrate_daily_k_data(sqlite_conn, pg_conn)
-        adjust_count = await migrate_adjust_factor(sqlite_conn, pg_conn)
+        try:
+            async with asyncio.TaskGroup() as tg:
+                stock_task = tg.create_task(migrate_stock_basic(sqlite_conn, pool))
+                kdata_task = tg.create_task(migrate_daily_k_data(
+                    source_path, pool, total, prefixes, existing, on_conflict
+                ))
+                adjust_task = tg.create_task(migrate_adjust_factor(sqlite_conn, pool))
+        finally:
+            async with pool.acquire() as pg_conn:
+                await finish_bulk_load(pg_conn)
+        stock_count, kdata_count, adjust_count = (
+            stock_task.result(), kdata_task.result(), adjust_task.result()
+        )
+
+        async with pool.acquire() as pg_conn:
+            await create_indexes_and_constraints(pg_conn)
 
         elapsed = datetime.now() - start_time
 
@@ -355,7 +1006,7 @@ async def main(source_path: Path, postgres_url: str):
 
     finally:
         sqlite_conn.close()
-        await pg_conn.close()
+        await pool.close()
 
 
 def cli():
@@ -395,8 +1046,10 @@ Environment Variables:
 
     args = parser.parse_args()
 
-    # Run migration
-    exit_code = asyncio.run(main(args.source, args.database_url))
+    # Run migration, on uvloop's faster socket I/O when it is installed
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        exit_code = runner.run(main(args.source, args.database_url))
     exit(exit_code)
 
 
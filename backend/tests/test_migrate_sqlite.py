@@ -0,0 +1,174 @@
+"""Tests for the pure helpers of scripts/migrate_sqlite.py."""
+
+import importlib.util
+import struct
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+SCRIPT_PATH = Path(__file__).parent.parent / "scripts" / "migrate_sqlite.py"
+
+
+@pytest.fixture(scope="module")
+def migrate():
+    """Load the script as a module (scripts/ is not a package)."""
+    spec = importlib.util.spec_from_file_location("migrate_sqlite", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def decode_copy_binary(payload: bytes) -> list[list[bytes | None]]:
+    """Split a binary COPY stream into rows of raw field values (None for NULL)."""
+    assert payload[:11] == b"PGCOPY\n\xff\r\n\x00"
+    flags, extension_length = struct.unpack_from(">ii", payload, 11)
+    assert (flags, extension_length) == (0, 0)
+
+    offset = 19
+    rows = []
+    while True:
+        (field_count,) = struct.unpack_from(">h", payload, offset)
+        offset += 2
+        if field_count == -1:
+            break
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from(">i", payload, offset)
+            offset += 4
+            if length == -1:
+                fields.append(None)
+            else:
+                fields.append(payload[offset:offset + length])
+                offset += length
+        rows.append(fields)
+
+    assert offset == len(payload), "trailing bytes after the COPY trailer"
+    return rows
+
+
+def test_encode_copy_binary_framing(migrate):
+    payload = migrate.encode_copy_binary([], migrate.DAILY_K_STAGING_ENCODERS)
+
+    assert payload == migrate.COPY_BINARY_HEADER + migrate.COPY_BINARY_TRAILER
+    assert decode_copy_binary(payload) == []
+
+
+def test_encode_copy_binary_values(migrate):
+    encoders = (
+        migrate._encode_date, migrate._encode_text, migrate._encode_int8,
+        migrate._encode_float8, migrate._encode_int4,
+    )
+    records = [
+        (date(2024, 1, 2), "sh.600000", 123456789012, 10.25, -3),
+        (date(1999, 12, 31), "sz.000001", None, None, None),
+    ]
+
+    rows = decode_copy_binary(migrate.encode_copy_binary(records, encoders))
+
+    assert len(rows) == 2
+    day, code, volume, close, status = rows[0]
+    # Binary dates count days from 2000-01-01
+    assert struct.unpack(">i", day) == (8767,)
+    assert code.decode() == "sh.600000"
+    assert struct.unpack(">q", volume) == (123456789012,)
+    assert struct.unpack(">d", close) == (10.25,)
+    assert struct.unpack(">i", status) == (-3,)
+
+    assert struct.unpack(">i", rows[1][0]) == (-1,)
+    assert rows[1][2:] == [None, None, None]
+
+
+def test_daily_k_encoders_match_column_types(migrate):
+    """The encoder tuple is positional; keep it aligned with the staging column types."""
+    int8_columns = {"volume"}
+    int4_columns = {"trade_status", "is_st"}
+    expected = {
+        "date": migrate._encode_date,
+        "code": migrate._encode_text,
+        **dict.fromkeys(migrate.DAILY_K_NUMERIC_COLUMNS, migrate._encode_float8),
+        **dict.fromkeys(int8_columns, migrate._encode_int8),
+        **dict.fromkeys(int4_columns, migrate._encode_int4),
+    }
+
+    assert len(migrate.DAILY_K_STAGING_ENCODERS) == len(migrate.DAILY_K_COLUMNS)
+    assert set(expected) == set(migrate.DAILY_K_COLUMNS)
+    for column, encoder in zip(
+        migrate.DAILY_K_COLUMNS, migrate.DAILY_K_STAGING_ENCODERS, strict=True
+    ):
+        assert encoder is expected[column], column
+
+
+def test_encode_kdata_batch(migrate):
+    columns = [
+        "id", "date", "code", "open", "high", "low", "close", "preclose", "volume",
+        "amount", "turn", "tradestatus", "pctChg", "peTTM", "pbMRQ", "psTTM",
+        "pcfNcfTTM", "isST",
+    ]
+    row = (
+        1, "2024-01-02", "sh.600000", 7.1, 7.3, 7.0, 7.2, 7.05, 1500.0,
+        10800.5, 0.12, 1, 2.13, 5.5, 0.45, 1.2, None, 0,
+    )
+
+    (fields,) = decode_copy_binary(migrate.encode_kdata_batch([row], columns))
+    values = dict(zip(migrate.DAILY_K_COLUMNS, fields, strict=True))
+
+    assert struct.unpack(">i", values["date"]) == (8767,)
+    assert values["code"] == b"sh.600000"
+    assert struct.unpack(">d", values["close"]) == (7.2,)
+    assert struct.unpack(">q", values["volume"]) == (1500,)
+    assert struct.unpack(">i", values["trade_status"]) == (1,)
+    assert values["pcf_ncf_ttm"] is None
+
+
+def test_encode_copy_binary_rejects_short_records(migrate):
+    with pytest.raises(ValueError):
+        migrate.encode_copy_binary(
+            [(date(2024, 1, 2), "sh.600000")], migrate.DAILY_K_STAGING_ENCODERS
+        )
+
+
+def test_skip_migrated_follows_text_order(migrate):
+    # Non-zero-padded dates: text order, as SQLite's ORDER BY returns them, is not date order
+    days = sorted(f"2024-1-{day}" for day in range(1, 20))
+    rows = [("sh.600000", day) for day in days] + [("sh.600001", "2024-1-1")]
+    committed = days.index("2024-1-19") + 1
+
+    remaining = list(migrate.skip_migrated(rows, ["code", "date"], ("sh.600000", "2024-1-19")))
+
+    assert remaining == rows[committed:]
+    assert ("sh.600000", "2024-1-2") in remaining
+    assert ("sh.600000", "2024-1-9") in remaining
+    assert ("sh.600000", "2024-1-10") not in remaining
+
+
+def test_skip_migrated_past_last_row(migrate):
+    rows = [("sh.600000", "2024-01-02"), ("sh.600000", "2024-01-03")]
+
+    assert list(migrate.skip_migrated(rows, ["code", "date"], ("sh.600000", "2024-01-03"))) == []
+
+
+def test_source_fingerprint_changes_when_file_is_replaced(migrate, tmp_path):
+    source = tmp_path / "a_stock.db"
+    source.write_bytes(b"sample" * 10)
+    sample = migrate.source_fingerprint(source)
+
+    assert migrate.source_fingerprint(source) == sample
+
+    # e.g. the full dataset copied over the sample DB
+    source.write_bytes(b"full dataset" * 100)
+    assert migrate.source_fingerprint(source) != sample
+
+
+def test_source_fingerprint_includes_wal(migrate, tmp_path):
+    source = tmp_path / "a_stock.db"
+    source.write_bytes(b"db")
+    without_wal = migrate.source_fingerprint(source)
+
+    (tmp_path / "a_stock.db-wal").write_bytes(b"pending commits")
+    assert migrate.source_fingerprint(source) != without_wal
+
+
+def test_values_placeholders(migrate):
+    assert migrate.values_placeholders(1, 3) == "($1, $2, $3)"
+    assert migrate.values_placeholders(2, 2) == "($1, $2), ($3, $4)"